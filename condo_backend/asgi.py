@@ -1,7 +1,10 @@
 """
 ASGI config for condo_backend project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+built on first access by ``create_app()``, which also warms up the process and
+marks it ready (see core.warmup). ASGI servers load it in each serving
+process, so no worker hook is involved.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +16,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "condo_backend.settings")
 
-application = get_asgi_application()
+
+def create_app():
+    app = get_asgi_application()
+
+    from core import warmup
+    warmup.warm_up()
+    warmup.start_worker()
+    return app
+
+
+def __getattr__(name):
+    if name == "application":
+        globals()["application"] = create_app()
+        return globals()["application"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
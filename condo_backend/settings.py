@@ -2,8 +2,11 @@
 Django settings for condo_backend project.
 """
 import os
+import re
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # define BASE_DIR first
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -84,6 +87,27 @@ WSGI_APPLICATION = "condo_backend.wsgi.application"
 # SQLite by default; Postgres via env when you’re ready
 # --------------------------
 if os.getenv("DB_ENGINE") == "postgres":
+    # Connection reuse: a psycopg pool per alias (works under WSGI and ASGI),
+    # or with DB_POOL=False Django's persistent connections (WSGI only).
+    # Both health-check a connection before handing it out and recycle it
+    # after DB_CONN_MAX_LIFETIME seconds.
+    DB_POOL = os.getenv("DB_POOL", "True") == "True"
+    DB_CONN_MAX_LIFETIME = int(os.getenv("DB_CONN_MAX_LIFETIME", "1800"))
+    if DB_POOL:
+        _conn_reuse = {
+            "CONN_MAX_AGE": 0,  # connections go back to the pool after each request
+            "OPTIONS": {
+                "pool": {
+                    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+                    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "4")),
+                    "max_lifetime": DB_CONN_MAX_LIFETIME,
+                    "max_idle": int(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                },
+            },
+        }
+    else:
+        _conn_reuse = {"CONN_MAX_AGE": DB_CONN_MAX_LIFETIME}
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.postgresql",
@@ -92,16 +116,73 @@ if os.getenv("DB_ENGINE") == "postgres":
             "PASSWORD": os.getenv("DB_PASSWORD", ""),
             "HOST": os.getenv("DB_HOST", "localhost"),
             "PORT": os.getenv("DB_PORT", "5432"),
+            "CONN_HEALTH_CHECKS": True,  # pool: checked on checkout; persistent: per request
+            **_conn_reuse,
         }
     }
 else:
+    # SQLite production profile: WAL lets readers run alongside the single
+    # writer, BEGIN IMMEDIATE takes the write lock up front (no deadlocking
+    # lock upgrades between gunicorn workers) and busy_timeout makes writers
+    # queue on the lock instead of failing with "database is locked".
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "20000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB (64 MiB)
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};"
+                    f"PRAGMA cache_size={SQLITE_CACHE_SIZE};"
+                    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};"
+                    "PRAGMA temp_store=MEMORY;"
+                ),
+            },
         }
     }
 
+# Write paths retry briefly when the database reports a lock (see core.db).
+DB_WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+DB_WRITE_RETRY_DELAY = float(os.getenv("DB_WRITE_RETRY_DELAY", "0.05"))
+
+# --------------------------
+# Condo sharding (opt-in)
+# CONDO_SHARDS="shard_1,shard_2" adds one database per alias and routes each
+# condo's units, parking and bookings to its shard (see core.sharding).
+# CONDO_SHARD_MAP="12:shard_2,40:shard_1" places specific new condos;
+# the rest are spread by id.
+# --------------------------
+CONDO_SHARDS = [a.strip() for a in os.getenv("CONDO_SHARDS", "").split(",") if a.strip()]
+CONDO_SHARD_MAP = {
+    int(condo_id): alias.strip()
+    for condo_id, alias in (
+        item.split(":") for item in os.getenv("CONDO_SHARD_MAP", "").split(",") if item
+    )
+}
+if CONDO_SHARD_MAP and not CONDO_SHARDS:
+    raise ImproperlyConfigured("CONDO_SHARD_MAP is set but CONDO_SHARDS is empty.")
+_unknown_shards = sorted(set(CONDO_SHARD_MAP.values()) - set(CONDO_SHARDS))
+if _unknown_shards:
+    raise ImproperlyConfigured(
+        f"CONDO_SHARD_MAP names shards not in CONDO_SHARDS: {', '.join(_unknown_shards)}."
+    )
+for _alias in CONDO_SHARDS:
+    _shard = dict(DATABASES["default"])
+    if _shard["ENGINE"] == "django.db.backends.sqlite3":
+        _shard["NAME"] = BASE_DIR / f"{_alias}.sqlite3"
+    else:
+        _shard["NAME"] = os.getenv(f"DB_NAME_{_alias.upper()}", f"{_shard['NAME']}_{_alias}")
+        _shard["HOST"] = os.getenv(f"DB_HOST_{_alias.upper()}", _shard["HOST"])
+    DATABASES[_alias] = _shard
+if CONDO_SHARDS:
+    DATABASE_ROUTERS = ["core.sharding.CondoShardRouter"]
+
 # --------------------------
 # Password validation
 # --------------------------
@@ -132,7 +213,32 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # token buckets shared across workers (see core.throttling)
+    "DEFAULT_THROTTLE_CLASSES": [
+        "core.throttling.ClientRateThrottle",
+        "core.throttling.CondoRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "client_read": os.getenv("THROTTLE_CLIENT_READ", "600/min"),
+        "client_write": os.getenv("THROTTLE_CLIENT_WRITE", "120/min"),
+        "client_export": os.getenv("THROTTLE_CLIENT_EXPORT", "10/min"),
+        "condo_read": os.getenv("THROTTLE_CONDO_READ", "1200/min"),
+        "condo_write": os.getenv("THROTTLE_CONDO_WRITE", "240/min"),
+        "condo_export": os.getenv("THROTTLE_CONDO_EXPORT", "20/min"),
+    },
+    # proxies that append to X-Forwarded-For in front of us (the Docker image
+    # sets 1 for the ALB); the local default 0 ignores the header, so clients
+    # can't pick their own throttle bucket
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
 }
+for _scope, _rate in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"].items():
+    # same "<n>/<period>" format core.throttling.parse_rate reads per request
+    if not re.fullmatch(r"[1-9]\d*/[smhd]\w*", _rate):
+        raise ImproperlyConfigured(f"THROTTLE_{_scope.upper()}={_rate!r}; expected e.g. '100/min'.")
+THROTTLE_STORE_PATH = os.getenv(
+    "THROTTLE_STORE_PATH",
+    "/dev/shm/condo_backend-throttle" if os.path.isdir("/dev/shm") else str(BASE_DIR / ".throttle"),
+)
 
 # --------------------------
 # CORS (open for now, tighten later)
@@ -4,8 +4,12 @@ from django.http import JsonResponse, HttpResponse
 from rest_framework.routers import DefaultRouter
 from core.views import (
     CondoViewSet, UnitViewSet, ParkingSpotViewSet,
-    UnitParkingAssignmentViewSet, ShortTermBookingViewSet
+    UnitParkingAssignmentViewSet, ShortTermBookingViewSet,
+    CondoUnitViewSet, CondoParkingSpotViewSet,
+    CondoUnitParkingAssignmentViewSet, CondoShortTermBookingViewSet,
+    db_pool_stats,
 )
+from core.warmup import is_ready
 
 def home(_request):
     return HttpResponse("Condo backend is running")
@@ -13,8 +17,11 @@ def home(_request):
 def ping(_request):
     return JsonResponse({"pong": True})
 
-def health(_request):                     # <— add this
-    return JsonResponse({"ok": True})
+def health(_request):
+    # 503 until core.warmup has run, so load balancers hold traffic for cold workers
+    if not is_ready():
+        return JsonResponse({"ok": False, "ready": False}, status=503)
+    return JsonResponse({"ok": True, "ready": True})
 
 router = DefaultRouter()
 router.register(r"condos", CondoViewSet, basename="condo")
@@ -23,10 +30,17 @@ router.register(r"parking-spots", ParkingSpotViewSet, basename="parkingspot")
 router.register(r"unit-parking-assignments", UnitParkingAssignmentViewSet, basename="unitparkingassignment")
 router.register(r"bookings", ShortTermBookingViewSet, basename="booking")
 
+# condo-scoped routes; with sharding on these hit a single shard
+router.register(r"condos/(?P<condo_pk>\d+)/units", CondoUnitViewSet, basename="condo-unit")
+router.register(r"condos/(?P<condo_pk>\d+)/parking-spots", CondoParkingSpotViewSet, basename="condo-parkingspot")
+router.register(r"condos/(?P<condo_pk>\d+)/unit-parking-assignments", CondoUnitParkingAssignmentViewSet, basename="condo-unitparkingassignment")
+router.register(r"condos/(?P<condo_pk>\d+)/bookings", CondoShortTermBookingViewSet, basename="condo-booking")
+
 urlpatterns = [
     path("", home),
-    path("api/healthz", health),          # <— add this
+    path("api/healthz", health),
     path("api/ping", ping),
+    path("api/metrics/db-pool", db_pool_stats),
     path("api/", include(router.urls)),
     path("admin/", admin.site.urls),
 ]
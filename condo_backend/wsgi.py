@@ -1,7 +1,11 @@
 """
 WSGI config for condo_backend project.
 
-It exposes the WSGI callable as a module-level variable named ``application``.
+It exposes the WSGI callable as a module-level variable named ``application``,
+built on first access by ``create_app()``, which also warms up the process and
+marks it ready (see core.warmup). gunicorn.conf.py calls
+``create_app(worker_hook=True)`` instead, which is safe in a preloading master
+and leaves the per-worker warm-up to its post_worker_init hook.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
@@ -13,4 +17,19 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "condo_backend.settings")
 
-application = get_wsgi_application()
+
+def create_app(worker_hook=False):
+    app = get_wsgi_application()
+
+    from core import warmup
+    warmup.warm_up()
+    if not worker_hook:
+        warmup.start_worker()
+    return app
+
+
+def __getattr__(name):
+    if name == "application":
+        globals()["application"] = create_app()
+        return globals()["application"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import sharding
+
+        condo = self.get_model("Condo")
+        post_save.connect(sharding.condo_saved, sender=condo)
+        post_delete.connect(sharding.condo_deleted, sender=condo)
+        post_migrate.connect(sharding.reserve_id_ranges, sender=self)
+        for model_name in sharding.SHARDED_MODELS:
+            pre_save.connect(sharding.allocate_sqlite_id, sender=self.get_model(model_name))
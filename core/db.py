@@ -0,0 +1,63 @@
+"""
+Database helpers: write retries for the API and connection pool metrics.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+LOCK_MESSAGES = ("database is locked", "database table is locked")
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(m in str(exc) for m in LOCK_MESSAGES)
+
+
+def _in_atomic_block():
+    # any alias, not just default: writes may be routed to a shard
+    return any(conn.in_atomic_block for conn in connections.all(initialized_only=True))
+
+
+def retry_on_lock(func=None, *, retries=None, delay=None):
+    """
+    Retry ``func`` with jittered exponential backoff when SQLite reports a lock.
+
+    busy_timeout already queues writers on the lock; this covers the cases it
+    can't (e.g. a timeout under a long burst). Calls made inside an atomic
+    block are never retried because the transaction is already broken.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, retries=retries, delay=delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = settings.DB_WRITE_RETRIES if retries is None else retries
+        base = settings.DB_WRITE_RETRY_DELAY if delay is None else delay
+        for attempt in range(attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == attempts or not is_lock_error(exc) or _in_atomic_block():
+                    raise
+                time.sleep(base * (2 ** attempt) * (0.5 + random.random()))
+
+    return wrapper
+
+
+def pool_stats():
+    """psycopg pool metrics for this process, per pooled alias."""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None or pool.closed:  # not pooled, or not opened in this process yet
+            continue
+        raw = pool.get_stats()
+        requests = raw.get("requests_num", 0)
+        stats[alias] = {
+            **raw,
+            "in_use": raw.get("pool_size", 0) - raw.get("pool_available", 0),
+            "avg_wait_ms": raw.get("requests_wait_ms", 0) / requests if requests else 0.0,
+        }
+    return stats
@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from core.models import Condo
+
+POOL_DEFAULTS = {"min_size": 1, "max_size": 4}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request DB latency on Postgres with a new connection per "
+        "request, persistent connections, and the connection pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--database", default="default", help="Alias whose settings are benchmarked.")
+
+    def handle(self, *args, requests, database, **options):
+        base = connections.settings[database]
+        if base["ENGINE"] != "django.db.backends.postgresql":
+            raise CommandError("db_pool_benchmark needs a Postgres alias (DB_ENGINE=postgres).")
+        options_without_pool = {k: v for k, v in base["OPTIONS"].items() if k != "pool"}
+        modes = {
+            "new connection": {"CONN_MAX_AGE": 0, "OPTIONS": options_without_pool},
+            "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True, "OPTIONS": options_without_pool},
+            "pool": {
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {**options_without_pool, "pool": base["OPTIONS"].get("pool") or POOL_DEFAULTS},
+            },
+        }
+        self.stdout.write(f"{requests} requests per mode against '{database}'")
+        self.stdout.write(f"  {'mode':16} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, overrides in modes.items():
+            timings = self.run_mode(f"bench_{name.replace(' ', '_')}", {**base, **overrides}, requests)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(
+                f"  {name:16} {statistics.mean(timings):8.2f} {statistics.median(timings):8.2f} {p95:8.2f}"
+            )
+
+    def run_mode(self, alias, settings_dict, requests):
+        connections.settings[alias] = settings_dict
+        try:
+            timings = []
+            for _ in range(requests):
+                # same connection handling as Django's request_started/request_finished
+                close_old_connections()
+                started = time.perf_counter()
+                Condo.objects.using(alias).order_by("pk").first()
+                close_old_connections()
+                timings.append((time.perf_counter() - started) * 1000)
+            return timings
+        finally:
+            conn = connections[alias]
+            conn.close()
+            if getattr(conn, "pool", None):
+                conn.close_pool()
+            del connections[alias]
+            del connections.settings[alias]
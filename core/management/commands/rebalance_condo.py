@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core import sharding
+from core.models import Condo, Unit, ParkingSpot, UnitParkingAssignment, ShortTermBooking
+
+# parents before children; deleted in reverse
+MOVE_ORDER = [
+    (Unit, "condo_id"),
+    (ParkingSpot, "condo_id"),
+    (UnitParkingAssignment, "unit__condo_id"),
+    (ShortTermBooking, "unit__condo_id"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Move one condo's units, parking and bookings to another shard, keeping "
+        "their ids. Pause writes to the condo while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("condo_id", type=int)
+        parser.add_argument("target", help="Destination database alias (a CONDO_SHARDS entry or 'default').")
+
+    def handle(self, *args, condo_id, target, **options):
+        if not sharding.sharding_enabled():
+            raise CommandError("Sharding is off; set CONDO_SHARDS first.")
+        if target not in sharding.all_shards():
+            raise CommandError(f"Unknown shard '{target}'. Choose from: {', '.join(sharding.all_shards())}.")
+        try:
+            condo = Condo.objects.using(DEFAULT_DB_ALIAS).get(pk=condo_id)
+        except Condo.DoesNotExist:
+            raise CommandError(f"Condo {condo_id} does not exist.")
+
+        source = condo.shard or DEFAULT_DB_ALIAS
+        if source == target:
+            self.stdout.write(f"Condo {condo_id} is already on {target}.")
+            return
+
+        condo.shard = "" if target == DEFAULT_DB_ALIAS else target
+        with transaction.atomic(using=target):
+            # moved rows keep their (other-range) ids; keep the target's own sequence
+            sequences = sharding.sqlite_sequences(target)
+            if target != DEFAULT_DB_ALIAS:
+                sharding.mirror_condo(condo, target)
+            for model, lookup in MOVE_ORDER:
+                rows = list(model._base_manager.using(source).filter(**{lookup: condo_id}))
+                model._base_manager.using(target).bulk_create(rows, batch_size=500)
+                self.stdout.write(f"  {model._meta.verbose_name_plural}: {len(rows)}")
+            sharding.restore_sqlite_sequences(target, sequences)
+
+        Condo.objects.using(DEFAULT_DB_ALIAS).filter(pk=condo_id).update(shard=condo.shard)
+
+        with transaction.atomic(using=source):
+            for model, lookup in reversed(MOVE_ORDER):
+                model._base_manager.using(source).filter(**{lookup: condo_id}).delete()
+            if source != DEFAULT_DB_ALIAS:
+                Condo._base_manager.using(source).filter(pk=condo_id).delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Moved condo {condo_id} from {source} to {target}."))
@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.utils import timezone
+
+from core.db import is_lock_error, retry_on_lock
+from core.models import Condo, Unit, ShortTermBooking
+
+ALIAS = "sqlite_stress"
+
+
+def _create_booking(unit_id, n):
+    now = timezone.now()
+    ShortTermBooking.objects.using(ALIAS).create(
+        unit_id=unit_id,
+        guest_first_name="Stress",
+        guest_last_name=f"Guest {n}",
+        id_number=f"ST-{os.getpid()}-{n}",
+        check_in=now + timedelta(days=n),
+        check_out=now + timedelta(days=n + 1),
+    )
+
+
+def _worker(unit_id, count, retry, results):
+    # forked from the parent; drop any inherited handle to the stress DB
+    connections[ALIAS].close()
+    write = retry_on_lock(_create_booking) if retry else _create_booking
+    ok = locked = 0
+    try:
+        for n in range(count):
+            try:
+                write(unit_id, n)
+                ok += 1
+            except OperationalError as exc:
+                if not is_lock_error(exc):
+                    raise
+                locked += 1
+    finally:
+        connections[ALIAS].close()
+        results.put((ok, locked))
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a scratch copy of the SQLite profile with concurrent booking "
+        "writes from several processes and report throughput and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=3)
+        parser.add_argument("--bookings", type=int, default=200, help="Bookings written per worker.")
+        parser.add_argument("--no-retry", action="store_true", help="Disable the write retry layer.")
+
+    def handle(self, *args, **options):
+        default = connections.settings["default"]
+        if default["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("sqlite_stress only runs against the SQLite profile.")
+
+        workers, per_worker = options["workers"], options["bookings"]
+        with tempfile.TemporaryDirectory() as tmp:
+            connections.settings[ALIAS] = {**default, "NAME": os.path.join(tmp, "stress.sqlite3")}
+            try:
+                call_command("migrate", database=ALIAS, verbosity=0, interactive=False)
+                condo = Condo.objects.using(ALIAS).create(name="Stress Condo")
+                unit = Unit.objects.using(ALIAS).create(condo=condo, unit_number="101")
+                connections[ALIAS].close()
+
+                ctx = multiprocessing.get_context("fork")
+                results = ctx.Queue()
+                procs = [
+                    ctx.Process(target=_worker, args=(unit.pk, per_worker, not options["no_retry"], results))
+                    for _ in range(workers)
+                ]
+                started = time.perf_counter()
+                for p in procs:
+                    p.start()
+                totals = [results.get() for _ in procs]
+                for p in procs:
+                    p.join()
+                elapsed = time.perf_counter() - started
+
+                written = ShortTermBooking.objects.using(ALIAS).count()
+            finally:
+                connections[ALIAS].close()
+                del connections[ALIAS]
+                del connections.settings[ALIAS]
+
+        ok = sum(t[0] for t in totals)
+        locked = sum(t[1] for t in totals)
+        self.stdout.write(
+            f"workers={workers} bookings={ok}/{workers * per_worker} rows={written} "
+            f"lock_errors={locked} elapsed={elapsed:.2f}s throughput={ok / elapsed:.0f} writes/s"
+        )
+        if locked or written != ok:
+            raise CommandError(f"{locked} writes failed with 'database is locked'.")
@@ -0,0 +1,116 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+
+def _module_of(filename, roots):
+    """'/.../site-packages/django/db/models/query.py' -> 'django.db'"""
+    if filename == "~":
+        return "<builtins>"
+    filename = os.path.realpath(filename)
+    for root in roots:
+        if filename.startswith(root + os.sep):
+            parts = filename[len(root) + 1:].removesuffix(".py").split(os.sep)
+            return ".".join(parts[:2])
+    return "<other>"
+
+
+class Command(BaseCommand):
+    help = (
+        "Report what a cold worker pays at start-up: import time per module "
+        "(in a fresh interpreter) and first-request cost per module for each path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="Rows per table.")
+        parser.add_argument(
+            "--path", action="append", dest="paths",
+            help="Request path to profile (repeatable). Defaults to the API routes.",
+        )
+        parser.add_argument(
+            "--warm", action="store_true",
+            help="Run the start-up warm-up first, to see what it leaves for the first request.",
+        )
+
+    def handle(self, *args, top, paths, warm, **options):
+        self.report_imports(top)
+        if warm:
+            from core import warmup
+            warmup.warm_up()
+            warmup.start_worker()
+        self.report_first_requests(paths or self.default_paths(), top, warm)
+
+    def report_imports(self, top):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "from condo_backend.wsgi import application"],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(f"Importing condo_backend.wsgi failed:\n{result.stderr[-2000:]}")
+        rows = []
+        by_package = defaultdict(int)
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                self_us, cumulative_us, module = match.groups()
+                rows.append((int(cumulative_us), int(self_us), module))
+                by_package[module.split(".")[0]] += int(self_us)
+        total = sum(by_package.values())
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Import time for condo_backend.wsgi (incl. warm-up): {total / 1000:.1f} ms"
+        ))
+        self.stdout.write(f"  {'package':40} {'self ms':>9}")
+        for package, us in sorted(by_package.items(), key=lambda i: -i[1])[:top]:
+            self.stdout.write(f"  {package:40} {us / 1000:9.1f}")
+        self.stdout.write(f"  {'module':40} {'self ms':>9} {'cumul ms':>9}")
+        for cumulative_us, self_us, module in sorted(rows, key=lambda r: -r[1])[:top]:
+            self.stdout.write(f"  {module:40} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}")
+
+    def default_paths(self):
+        from condo_backend.urls import router
+
+        # not /api/healthz: it stays 503 in a process that hasn't warmed up
+        return ["/api/"] + [
+            f"/api/{prefix}/" for prefix, _viewset, _basename in router.registry if "(?P" not in prefix
+        ]
+
+    def report_first_requests(self, paths, top, warm):
+        client = Client(raise_request_exception=False)
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)  # statuses are reported below
+        roots = sorted({os.path.realpath(p) for p in sys.path if p}, key=len, reverse=True)
+        state = "after warm-up" if warm else "this process starts cold"
+        self.stdout.write(self.style.MIGRATE_HEADING(f"First vs second request ({state})"))
+        for path in paths:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            response = client.get(path)
+            profiler.disable()
+            first = time.perf_counter() - started
+            started = time.perf_counter()
+            client.get(path)
+            second = time.perf_counter() - started
+
+            self.stdout.write(
+                f"  {path} [{response.status_code}] first {first * 1000:.1f} ms, "
+                f"second {second * 1000:.1f} ms"
+            )
+            by_module = defaultdict(float)
+            for (filename, _line, _func), (_cc, _nc, tt, _ct, _callers) in pstats.Stats(profiler).stats.items():
+                by_module[_module_of(filename, roots)] += tt
+            for module, seconds in sorted(by_module.items(), key=lambda i: -i[1])[:top]:
+                if seconds >= 0.0005:
+                    self.stdout.write(f"      {module:36} {seconds * 1000:8.1f} ms")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_parkingspot_shorttermbooking_unitparkingassignment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="condo",
+            name="shard",
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
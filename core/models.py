@@ -2,6 +2,8 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .sharding import ShardedQuerySet
+
 # ---------- Core ----------
 
 class Condo(models.Model):
@@ -10,6 +12,7 @@ class Condo(models.Model):
     city = models.CharField(max_length=100, blank=True)
     province = models.CharField(max_length=50, blank=True)  # e.g., ON
     code = models.CharField(max_length=50, blank=True)      # internal code if you use one
+    shard = models.CharField(max_length=100, blank=True, editable=False)  # DB alias when sharded
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -27,6 +30,8 @@ class Unit(models.Model):
     status = models.CharField(max_length=30, blank=True)  # e.g., owner-occupied, tenanted
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ("condo", "unit_number")
         ordering = ["condo__name", "unit_number"]
@@ -45,6 +50,8 @@ class ParkingSpot(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ("condo", "code")
         ordering = ["condo__name", "code"]
@@ -61,6 +68,8 @@ class UnitParkingAssignment(models.Model):
     is_primary = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ["unit__condo__name", "unit__unit_number", "-start_date"]
 
@@ -125,6 +134,8 @@ class ShortTermBooking(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ["-check_in"]
 
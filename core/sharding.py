@@ -0,0 +1,338 @@
+"""
+Opt-in per-condo database sharding (enabled by ``settings.CONDO_SHARDS``).
+
+Condo rows stay canonical on ``default`` and record the alias of the shard
+that owns them; a copy is mirrored into that shard so its tables keep their
+foreign keys. Units, parking and bookings live only in the condo's shard.
+Condos without a shard (created before sharding was switched on) keep their
+data on ``default``, which therefore acts as one more shard.
+
+A request pins its shard with ``pin_shard()``/``set_shard()`` and the router
+sends every core query there. Outside a pinned block the router routes by
+the instance being saved or followed (its condo's shard) and refuses writes
+it can't place. Unpinned reads of sharded models should go through ``FanOut``.
+
+Each shard reserves its own id range at migrate time so rows keep globally
+unique ids and can move between shards unchanged. SQLite's AUTOINCREMENT
+would continue after the highest moved-in id, so on SQLite new rows take
+their id from the shard's own sequence (``allocate_sqlite_id``) and
+rebalancing restores that sequence after copying rows in.
+"""
+import contextlib
+import functools
+import heapq
+import itertools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models, router
+from django.db.models import F
+from django.db.models.functions import Collate
+
+SHARDED_MODELS = ("unit", "parkingspot", "unitparkingassignment", "shorttermbooking")
+ID_RANGE = 10 ** 12
+
+_pinned = ContextVar("condo_shard", default=None)
+
+
+def sharding_enabled():
+    return bool(settings.CONDO_SHARDS)
+
+
+def all_shards():
+    return [DEFAULT_DB_ALIAS, *settings.CONDO_SHARDS]
+
+
+def is_sharded(model):
+    return model._meta.app_label == "core" and model._meta.model_name in SHARDED_MODELS
+
+
+# ---------- Shard map ----------
+
+def assign_shard(condo_id):
+    """Shard a new condo is placed on: CONDO_SHARD_MAP first, then spread by id."""
+    shards = settings.CONDO_SHARDS
+    return settings.CONDO_SHARD_MAP.get(int(condo_id)) or shards[int(condo_id) % len(shards)]
+
+
+def shard_for_condo(condo_id):
+    """Alias holding the condo's data, or None if the condo doesn't exist."""
+    from .models import Condo
+
+    row = Condo.objects.using(DEFAULT_DB_ALIAS).filter(pk=condo_id).values_list("shard", flat=True)
+    shard = row.first()
+    return None if shard is None else (shard or DEFAULT_DB_ALIAS)
+
+
+def id_range_owner(pk):
+    shards = all_shards()
+    index = int(pk) // ID_RANGE
+    return shards[index] if index < len(shards) else None
+
+
+def find_shard(model, pk):
+    """Probe the shards for ``pk``, starting with the one whose id range it falls in."""
+    owner = id_range_owner(pk)
+    for alias in sorted(all_shards(), key=lambda a: a != owner):
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            return alias
+    return None
+
+
+# ---------- Request pinning ----------
+
+@contextlib.contextmanager
+def pin_shard(alias=None):
+    """Route core queries to ``alias`` for the block; set_shard() inside it is undone on exit."""
+    token = _pinned.set(alias)
+    try:
+        yield alias
+    finally:
+        _pinned.reset(token)
+
+
+def set_shard(alias):
+    _pinned.set(alias)
+
+
+def current_shard():
+    return _pinned.get()
+
+
+class ShardRoutingError(Exception):
+    """A write to a sharded model has no shard: nothing pinned and no instance to route by."""
+
+
+def shard_for_instance(instance):
+    """Alias an instance (or rows related to it) lives on, worked out from its condo."""
+    from .models import Condo, Unit
+
+    if isinstance(instance, Condo):
+        return instance.shard or DEFAULT_DB_ALIAS
+    if instance._state.db:
+        return instance._state.db
+    if getattr(instance, "condo_id", None) is not None:
+        return shard_for_condo(instance.condo_id)
+    unit = instance._state.fields_cache.get("unit")
+    if unit is not None:
+        return shard_for_instance(unit)
+    if getattr(instance, "unit_id", None) is not None:
+        return find_shard(Unit, instance.unit_id)
+    return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    """create() routes by the new row's condo when no shard is pinned."""
+
+    def create(self, **kwargs):
+        if self._db is not None or _pinned.get() is not None or not sharding_enabled():
+            return super().create(**kwargs)
+        alias = router.db_for_write(self.model, instance=self.model(**kwargs))
+        return self.using(alias).create(**kwargs)
+
+
+class CondoShardRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != "core":
+            return None
+        if _pinned.get() is not None:
+            return _pinned.get()
+        if is_sharded(model) and "instance" in hints:
+            return shard_for_instance(hints["instance"])
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_sharded(model):
+            alias = _pinned.get()
+            if alias is None and "instance" in hints:
+                alias = shard_for_instance(hints["instance"])
+            if alias is None:
+                raise ShardRoutingError(
+                    f"No shard for this {model._meta.verbose_name} write; "
+                    "pin one with pin_shard() or save an instance with its condo set."
+                )
+            return alias
+        if model._meta.app_label == "core":
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.app_label == "core" and obj2._meta.app_label == "core":
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.CONDO_SHARDS:
+            return app_label == "core"
+        return None
+
+
+# ---------- Cross-shard reads ----------
+
+# Codepoint-order collations, so every shard sorts text the way Python compares it
+CODEPOINT_COLLATIONS = {"sqlite": "BINARY", "postgresql": "C"}
+
+
+def _field_at(model, path):
+    for part in path.split("__"):
+        field = model._meta.pk if part == "pk" else model._meta.get_field(part)
+        model = field.related_model or model
+    return field
+
+
+def _value_at(obj, path):
+    for part in path.split("__"):
+        obj = getattr(obj, part)
+    return obj
+
+
+class FanOut:
+    """
+    Read-only view of one queryset across every shard, merged in the
+    queryset's ordering. Supports what pagination needs: count() and slicing,
+    where a slice only pulls the first ``stop`` rows from each shard.
+
+    The merge compares rows in Python, so each shard orders text columns by
+    codepoint (not its locale collation) and joins the relations the ordering
+    goes through. Orderings must be plain field paths.
+    """
+
+    def __init__(self, queryset, aliases=None):
+        self.ordering = [*(queryset.query.order_by or queryset.model._meta.ordering), "pk"]
+        relations = {f.lstrip("-").rsplit("__", 1)[0] for f in self.ordering if "__" in f}
+        if relations:
+            queryset = queryset.select_related(*relations)
+        self.querysets = [self._merge_order(queryset.using(alias), alias) for alias in aliases or all_shards()]
+        self.key = functools.cmp_to_key(self._compare)
+
+    def _merge_order(self, queryset, alias):
+        collation = CODEPOINT_COLLATIONS.get(connections[alias].vendor)
+        order_by = []
+        for field in self.ordering:
+            path = field.lstrip("-")
+            expr = F(path)
+            if collation and isinstance(_field_at(queryset.model, path), (models.CharField, models.TextField)):
+                expr = Collate(expr, collation)
+            order_by.append(expr.desc() if field.startswith("-") else expr.asc())
+        return queryset.order_by(*order_by)
+
+    def _compare(self, a, b):
+        for field in self.ordering:
+            path = field.lstrip("-")
+            x, y = _value_at(a, path), _value_at(b, path)
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if field.startswith("-") else result
+        return 0
+
+    def count(self):
+        return sum(qs.count() for qs in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        parts = [qs if stop is None else qs[:stop] for qs in self.querysets]
+        return list(itertools.islice(heapq.merge(*parts, key=self.key), start, stop))
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+# ---------- Signals (connected in CoreConfig.ready) ----------
+
+def mirror_condo(condo, alias):
+    copy = type(condo)(**{f.attname: getattr(condo, f.attname) for f in condo._meta.concrete_fields})
+    copy.save_base(using=alias, raw=True)
+
+
+def condo_saved(sender, instance, using, created=False, raw=False, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS or not sharding_enabled():
+        return
+    if created and not instance.shard:
+        shard = assign_shard(instance.pk)
+        if shard not in settings.CONDO_SHARDS:
+            raise ImproperlyConfigured(f"Condo {instance.pk} maps to unknown shard '{shard}'.")
+        # mirror first: default must never record a shard that doesn't hold the condo
+        instance.shard = shard
+        mirror_condo(instance, shard)
+        sender.objects.using(using).filter(pk=instance.pk).update(shard=shard)
+    elif instance.shard:
+        mirror_condo(instance, instance.shard)
+
+
+def condo_deleted(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and instance.shard and sharding_enabled():
+        sender._base_manager.using(instance.shard).filter(pk=instance.pk).delete()
+
+
+def allocate_sqlite_id(sender, instance, using, raw=False, **kwargs):
+    """pre_save: give new rows on a SQLite shard the next id of that shard's range."""
+    if raw or instance.pk is not None or not sharding_enabled() or using not in all_shards():
+        return
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    table = sender._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = %s RETURNING seq", [table])
+        row = cursor.fetchone()
+        if row is None:
+            row = (all_shards().index(using) * ID_RANGE + 1,)
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, row[0]])
+    instance.pk = row[0]
+
+
+def sqlite_sequences(alias):
+    """{table: seq} for the sharded tables on a SQLite alias; {} elsewhere."""
+    from django.apps import apps
+
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        return {}
+    tables = [apps.get_model("core", name)._meta.db_table for name in SHARDED_MODELS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, seq FROM sqlite_sequence WHERE name IN ({', '.join(['%s'] * len(tables))})", tables
+        )
+        sequences = dict(cursor.fetchall())
+    base = all_shards().index(alias) * ID_RANGE
+    return {table: sequences.get(table, base) for table in tables}
+
+
+def restore_sqlite_sequences(alias, sequences):
+    with connections[alias].cursor() as cursor:
+        for table, seq in sequences.items():
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [seq, table])
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, seq])
+
+
+def reserve_id_ranges(sender, using, **kwargs):
+    """Start each shard's sharded-model ids at its own ID_RANGE block."""
+    if using not in settings.CONDO_SHARDS:
+        return
+    from django.apps import apps
+
+    base = all_shards().index(using) * ID_RANGE
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model_name in SHARDED_MODELS:
+            table = apps.get_model("core", model_name)._meta.db_table
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, base])
+                elif row[0] < base:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [base, table])
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f"SELECT last_value FROM {sequence}")
+                if cursor.fetchone()[0] < base:
+                    cursor.execute("SELECT setval(%s, %s)", [sequence, base])
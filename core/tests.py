@@ -1,6 +1,419 @@
-from django.test import TestCase
+import multiprocessing
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.test import TestCase, override_settings
 from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import sharding, warmup
+from .db import pool_stats, retry_on_lock
+from .throttling import TokenBucketStore, parse_rate
+from .models import Condo, Unit, ParkingSpot, UnitParkingAssignment, ShortTermBooking
+
+def setUpModule():
+    # keep API tests off the shared /dev/shm store a dev server may be using
+    tmp = tempfile.TemporaryDirectory()
+    override = override_settings(THROTTLE_STORE_PATH=os.path.join(tmp.name, "buckets"))
+    override.enable()
+    unittest.addModuleCleanup(tmp.cleanup)
+    unittest.addModuleCleanup(override.disable)
 
 class SmokeTest(TestCase):
     def test_core_app_loaded(self):
         self.assertTrue(apps.is_installed("core"))
+
+class SQLiteProfileTest(TestCase):
+    def test_connection_pragmas_applied(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite profile only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_retry_on_lock_retries_then_succeeds(self):
+        calls = mock.Mock(side_effect=[OperationalError("database is locked"), "ok"])
+        with mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(retry_on_lock(calls, delay=0)(), "ok")
+        self.assertEqual(calls.call_count, 2)
+
+    def test_retry_on_lock_ignores_other_errors(self):
+        calls = mock.Mock(side_effect=OperationalError("no such table: x"))
+        with mock.patch.object(connection, "in_atomic_block", False):
+            with self.assertRaises(OperationalError):
+                retry_on_lock(calls, delay=0)()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_retry_on_lock_never_retries_inside_any_atomic_block(self):
+        calls = mock.Mock(side_effect=OperationalError("database is locked"))
+        shard = mock.Mock(in_atomic_block=True)
+        with mock.patch.object(connection, "in_atomic_block", False), \
+                mock.patch("core.db.connections.all", return_value=[connections["default"], shard]):
+            with self.assertRaises(OperationalError):
+                retry_on_lock(calls, delay=0)()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_stress_command_reports_no_lock_errors(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite profile only")
+        # separate process: the command forks workers onto its own scratch DB
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "sqlite_stress",
+             "--workers", "3", "--bookings", "20"],
+            capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("lock_errors=0", result.stdout)
+
+def booking_payload(unit, **extra):
+    now = timezone.now()
+    return {
+        "unit": unit.pk, "guest_first_name": "Ada", "guest_last_name": "Guest",
+        "id_number": "X1", "check_in": now.isoformat(),
+        "check_out": (now + timedelta(days=2)).isoformat(), **extra,
+    }
+
+class CondoScopedApiTest(APITestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.a = Condo.objects.create(name="Alpha")
+        self.b = Condo.objects.create(name="Bravo")
+        self.unit_a = Unit.objects.using(self.a.shard or "default").create(condo_id=self.a.pk, unit_number="101")
+        self.unit_b = Unit.objects.using(self.b.shard or "default").create(condo_id=self.b.pk, unit_number="201")
+
+    def test_scoped_list_only_returns_condo_rows(self):
+        res = self.client.get(f"/api/condos/{self.a.pk}/units/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([u["id"] for u in res.data["results"]], [self.unit_a.pk])
+
+    def test_scoped_create_rejects_unit_from_other_condo(self):
+        res = self.client.post(f"/api/condos/{self.a.pk}/bookings/", booking_payload(self.unit_b), format="json")
+        self.assertEqual(res.status_code, 400)
+
+    def test_scoped_create_and_unscoped_list(self):
+        for condo, unit in ((self.a, self.unit_a), (self.b, self.unit_b)):
+            res = self.client.post(f"/api/condos/{condo.pk}/bookings/", booking_payload(unit), format="json")
+            self.assertEqual(res.status_code, 201, res.data)
+        res = self.client.get("/api/bookings/")
+        self.assertEqual(res.data["count"], 2)
+        booking_id = res.data["results"][0]["id"]
+        self.assertEqual(self.client.get(f"/api/bookings/{booking_id}/").status_code, 200)
+
+    def test_unknown_condo_is_404(self):
+        self.assertEqual(self.client.get("/api/condos/999999/bookings/").status_code, 404)
+
+    def test_malformed_detail_and_create_requests(self):
+        self.assertEqual(self.client.get("/api/bookings/abc/").status_code, 404)
+        res = self.client.post("/api/bookings/", [booking_payload(self.unit_a)], format="json")
+        self.assertEqual(res.status_code, 400)
+
+@skipUnless(settings.CONDO_SHARDS, "set CONDO_SHARDS to run sharding tests")
+class ShardingTest(APITestCase):
+    databases = "__all__"
+
+    def test_new_condo_is_assigned_and_mirrored(self):
+        condo = Condo.objects.create(name="Alpha")
+        self.assertIn(condo.shard, settings.CONDO_SHARDS)
+        self.assertTrue(Condo.objects.using(condo.shard).filter(pk=condo.pk).exists())
+
+    def test_unknown_mapped_shard_is_not_recorded(self):
+        with mock.patch.object(sharding, "assign_shard", return_value="shard_c"):
+            with self.assertRaises(ImproperlyConfigured):
+                Condo.objects.create(name="Alpha")
+        self.assertEqual(Condo.objects.get(name="Alpha").shard, "")
+
+    def test_settings_reject_map_to_unknown_shard(self):
+        for shards in ("shard_a,shard_b", ""):
+            env = {**os.environ, "CONDO_SHARDS": shards, "CONDO_SHARD_MAP": "1:shard_c"}
+            result = subprocess.run(
+                [sys.executable, "manage.py", "check"],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("ImproperlyConfigured", result.stderr)
+
+    def test_scoped_writes_land_on_the_condo_shard(self):
+        condo = Condo.objects.create(name="Alpha")
+        res = self.client.post(f"/api/condos/{condo.pk}/units/", {"condo": condo.pk, "unit_number": "101"}, format="json")
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertTrue(Unit.objects.using(condo.shard).filter(pk=res.data["id"]).exists())
+        self.assertFalse(Unit.objects.using("default").filter(pk=res.data["id"]).exists())
+        self.assertEqual(sharding.id_range_owner(res.data["id"]), condo.shard)
+
+    def test_rebalance_moves_condo_rows(self):
+        condo = Condo.objects.create(name="Alpha")
+        source = condo.shard
+        target = next(a for a in settings.CONDO_SHARDS + ["default"] if a != source)
+        unit = Unit.objects.using(source).create(condo_id=condo.pk, unit_number="101")
+        res = self.client.post(f"/api/condos/{condo.pk}/bookings/", booking_payload(unit), format="json")
+        self.assertEqual(res.status_code, 201, res.data)
+
+        call_command("rebalance_condo", condo.pk, target, stdout=StringIO())
+
+        self.assertTrue(ShortTermBooking.objects.using(target).filter(pk=res.data["id"]).exists())
+        self.assertFalse(Unit.objects.using(source).filter(pk=unit.pk).exists())
+        res = self.client.get(f"/api/condos/{condo.pk}/bookings/{res.data['id']}/")
+        self.assertEqual(res.status_code, 200)
+
+    def test_unpinned_writes_route_by_instance(self):
+        condo = Condo.objects.create(name="Alpha")
+        unit = Unit(condo=condo, unit_number="101")
+        unit.save()
+        self.assertTrue(Unit.objects.using(condo.shard).filter(pk=unit.pk).exists())
+
+        created = Unit.objects.create(condo_id=condo.pk, unit_number="102")
+        self.assertEqual(created._state.db, condo.shard)
+
+        now = timezone.now()
+        booking = ShortTermBooking(
+            unit=unit, guest_first_name="Ada", guest_last_name="Guest", id_number="X1",
+            check_in=now, check_out=now + timedelta(days=2),
+        )
+        booking.save()
+        self.assertTrue(ShortTermBooking.objects.using(condo.shard).filter(pk=booking.pk).exists())
+
+        loaded = Unit.objects.using(condo.shard).get(pk=unit.pk)
+        loaded.status = "tenanted"
+        loaded.save()
+        self.assertEqual(Unit.objects.using(condo.shard).get(pk=unit.pk).status, "tenanted")
+        self.assertEqual(list(condo.units.order_by("pk")), [unit, created])
+        self.assertFalse(Unit.objects.using("default").exists())
+
+    def test_fan_out_merges_in_codepoint_order(self):
+        names = ["alpha", "Bravo", "Zulu", "Ödön", "charlie"]
+        for name in names:
+            condo = Condo.objects.create(name=name)
+            Unit.objects.create(condo=condo, unit_number="101")
+            Unit.objects.create(condo=condo, unit_number="A1")
+        res = self.client.get("/api/units/", {"page": 1})
+        expected = sorted((name, n) for name in names for n in ("101", "A1"))[:20]
+        by_condo = dict(Condo.objects.values_list("pk", "name"))
+        self.assertEqual([(by_condo[u["condo"]], u["unit_number"]) for u in res.data["results"]], expected)
+
+    def test_fan_out_joins_ordering_relations(self):
+        condo = Condo.objects.create(name="Alpha")
+        spot = ParkingSpot.objects.create(condo=condo, code="P1")
+        for n in range(3):
+            unit = Unit.objects.create(condo=condo, unit_number=str(n))
+            UnitParkingAssignment.objects.create(unit=unit, parking_spot=spot, start_date=timezone.now().date())
+        queryset = UnitParkingAssignment.objects.select_related("unit", "parking_spot")
+        with self.assertNumQueries(1, using=condo.shard):
+            rows = sharding.FanOut(queryset)[0:20]
+            [row.unit.condo.name for row in rows]
+        self.assertEqual(len(rows), 3)
+
+    def test_unroutable_write_raises(self):
+        with self.assertRaises(sharding.ShardRoutingError):
+            Unit.objects.filter(unit_number="101").update(status="x")
+
+    def test_ids_stay_in_target_range_after_rebalance(self):
+        for target in ["default", *settings.CONDO_SHARDS]:
+            source = next(a for a in settings.CONDO_SHARDS if a != target)
+            condo = Condo.objects.create(name=f"Moving to {target}")
+            Condo.objects.filter(pk=condo.pk).update(shard=source)
+            sharding.mirror_condo(Condo.objects.get(pk=condo.pk), source)
+            Unit.objects.using(source).create(condo_id=condo.pk, unit_number="101")
+
+            call_command("rebalance_condo", condo.pk, target, stdout=StringIO())
+
+            with sharding.pin_shard(target):
+                unit = Unit.objects.create(condo_id=condo.pk, unit_number="102")
+            self.assertEqual(sharding.id_range_owner(unit.pk), target)
+
+def _drain_bucket(path):
+    store = TokenBucketStore(path)
+    for _ in range(3):
+        store.consume("client:read:shared", 5, 0.001)
+
+class TokenBucketStoreTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "buckets")
+        self.store = TokenBucketStore(self.path)
+
+    def test_burst_then_wait_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(self.store.consume("k", 3, 1.0, now=100.0), 0.0)
+        self.assertAlmostEqual(self.store.consume("k", 3, 1.0, now=100.0), 1.0)
+        self.assertEqual(self.store.consume("k", 3, 1.0, now=101.5), 0.0)
+
+    def test_buckets_are_shared_across_processes(self):
+        child = multiprocessing.get_context("fork").Process(target=_drain_bucket, args=(self.path,))
+        child.start()
+        child.join()
+        self.assertEqual(self.store.consume("client:read:shared", 5, 0.001), 0.0)
+        self.assertEqual(self.store.consume("client:read:shared", 5, 0.001), 0.0)
+        self.assertGreater(self.store.consume("client:read:shared", 5, 0.001), 0.0)
+
+    def test_parse_rate_rejects_malformed_rates(self):
+        self.assertEqual(parse_rate("120/min"), (120, 2.0))
+        for rate in ("600", "0/min", "ten/min", "5/week"):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+    def test_settings_reject_malformed_rate(self):
+        env = {**os.environ, "THROTTLE_CLIENT_READ": "600"}
+        result = subprocess.run(
+            [sys.executable, "manage.py", "check"],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("THROTTLE_CLIENT_READ", result.stderr)
+
+    def test_check_costs_microseconds(self):
+        started = time.perf_counter()
+        for i in range(2000):
+            self.store.consume(f"client:read:ip:{i % 50}", 600, 10.0)
+        self.assertLess((time.perf_counter() - started) / 2000, 200e-6)
+
+class ThrottleApiTest(APITestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        rates = {"client_read": "2/min", "client_write": "100/min", "condo_write": "1/min"}
+        override = override_settings(
+            THROTTLE_STORE_PATH=os.path.join(tmp.name, "buckets"),
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_reads_limited_per_client_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get("/api/condos/").status_code, 200)
+        res = self.client.get("/api/condos/")
+        self.assertEqual(res.status_code, 429)
+        self.assertGreaterEqual(int(res["Retry-After"]), 1)
+        self.assertEqual(self.client.get("/api/condos/", REMOTE_ADDR="10.0.0.9").status_code, 200)
+
+    def test_spoofed_forwarded_for_does_not_reset_bucket(self):
+        spoofed = lambda n: {"HTTP_X_FORWARDED_FOR": f"203.0.113.{n}", "REMOTE_ADDR": "10.0.0.5"}
+        for n in range(2):
+            self.assertEqual(self.client.get("/api/condos/", **spoofed(n)).status_code, 200)
+        self.assertEqual(self.client.get("/api/condos/", **spoofed(2)).status_code, 429)
+
+    def test_behind_proxy_client_is_last_forwarded_hop(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1,
+                                               "DEFAULT_THROTTLE_RATES": {"client_read": "2/min", "condo_read": "100/min"}}):
+            via_alb = lambda spoof, client: {"HTTP_X_FORWARDED_FOR": f"{spoof}, {client}", "REMOTE_ADDR": "10.0.0.1"}
+            for n in range(2):
+                self.assertEqual(self.client.get("/api/condos/", **via_alb(f"203.0.113.{n}", "198.51.100.7")).status_code, 200)
+            self.assertEqual(self.client.get("/api/condos/", **via_alb("203.0.113.9", "198.51.100.7")).status_code, 429)
+            self.assertEqual(self.client.get("/api/condos/", **via_alb("203.0.113.9", "198.51.100.8")).status_code, 200)
+
+    def test_unopenable_store_lets_requests_through(self):
+        with override_settings(THROTTLE_STORE_PATH="/nonexistent/throttle/buckets"), \
+                self.assertLogs("core.throttling", "ERROR") as logs:
+            for _ in range(3):
+                self.assertEqual(self.client.get("/api/condos/").status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+
+    def test_writes_limited_per_condo(self):
+        a = Condo.objects.create(name="Alpha")
+        b = Condo.objects.create(name="Bravo")
+        payload = lambda condo, n: {"condo": condo.pk, "unit_number": str(n)}
+        self.assertEqual(self.client.post(f"/api/condos/{a.pk}/units/", payload(a, 1), format="json").status_code, 201)
+        self.assertEqual(self.client.post(f"/api/condos/{a.pk}/units/", payload(a, 2), format="json").status_code, 429)
+        self.assertEqual(self.client.post(f"/api/condos/{b.pk}/units/", payload(b, 1), format="json").status_code, 201)
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        # warm_up() closes every connection and a pooled warm_worker() hands its
+        # connection back; either would end the test transaction on Postgres
+        close_all = mock.patch.object(warmup.connections, "close_all")
+        close = mock.patch.object(type(connections["default"]), "close")
+        self.close_all = close_all.start()
+        close.start()
+        self.addCleanup(close_all.stop)
+        self.addCleanup(close.stop)
+
+    def test_healthz_ready_only_after_worker_start(self):
+        with mock.patch.object(warmup, "_ready", warmup.threading.Event()):
+            res = self.client.get("/api/healthz")
+            self.assertEqual(res.status_code, 503)
+            self.assertFalse(res.json()["ready"])
+
+            timings = warmup.warm_up()
+            self.assertEqual(set(timings), {"urls", "drf", "serializers"})
+            self.close_all.assert_called_once()
+            self.assertEqual(self.client.get("/api/healthz").status_code, 503)  # master-side only
+
+            warmup.start_worker()
+            self.assertEqual(self.client.get("/api/healthz").json(), {"ok": True, "ready": True})
+
+    def test_failed_worker_warm_up_is_logged_not_raised(self):
+        hooks = runpy.run_path(str(settings.BASE_DIR / "gunicorn.conf.py"))
+        worker = mock.Mock()
+        with mock.patch.object(warmup, "_ready", warmup.threading.Event()), \
+                mock.patch.object(warmup, "warm_worker", side_effect=OperationalError("db down")):
+            hooks["post_worker_init"](worker)
+            self.assertTrue(warmup.is_ready())
+        worker.log.exception.assert_called_once()
+
+    def test_startup_profile_imports_from_project_root(self):
+        imported = subprocess.CompletedProcess([], 0, stdout="", stderr="import time: 120 | 450 | django\n")
+        out = StringIO()
+        with mock.patch("subprocess.run", return_value=imported) as run, \
+                mock.patch.object(warmup, "_ready", warmup.threading.Event()):
+            call_command("startup_profile", "--top", "1", "--warm", "--path", "/api/healthz", stdout=out)
+        self.assertEqual(run.call_args.kwargs["cwd"], settings.BASE_DIR)
+        self.assertIn("django", out.getvalue())
+        self.assertIn("/api/healthz [200]", out.getvalue())
+
+    def test_startup_profile_fails_loudly_when_import_fails(self):
+        failed = subprocess.CompletedProcess([], 1, stdout="", stderr="ModuleNotFoundError: boom")
+        with mock.patch("subprocess.run", return_value=failed):
+            with self.assertRaisesMessage(CommandError, "boom"):
+                call_command("startup_profile", "--path", "/api/ping", stdout=StringIO())
+
+    def test_warm_worker_opens_persistent_connections_only(self):
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            self.assertNotIn("db:default", warmup.warm_worker())
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=600):
+            self.assertIn("db:default", warmup.warm_worker())
+        self.assertIsNotNone(connection.connection)
+
+class ConnectionPoolTest(APITestCase):
+    def test_pool_stats_derives_in_use_and_wait(self):
+        pool = mock.Mock(closed=False)
+        pool.get_stats.return_value = {
+            "pool_size": 4, "pool_available": 1, "requests_num": 10, "requests_wait_ms": 25,
+        }
+        with mock.patch.object(type(connections["default"]), "pool", pool, create=True):
+            stats = pool_stats()["default"]
+        self.assertEqual(stats["in_use"], 3)
+        self.assertEqual(stats["avg_wait_ms"], 2.5)
+
+    def test_pool_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get("/api/metrics/db-pool").status_code, 403)
+        admin = User.objects.create_user("ops", password="x", is_staff=True)
+        self.client.force_authenticate(admin)
+        res = self.client.get("/api/metrics/db-pool")
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.data, dict)
+
+    def test_benchmark_requires_postgres(self):
+        if connection.vendor == "postgresql":
+            self.skipTest("runs the real benchmark on Postgres")
+        with self.assertRaises(CommandError):
+            call_command("db_pool_benchmark", requests=1, stdout=StringIO())
@@ -0,0 +1,166 @@
+"""
+Token-bucket throttles shared by every gunicorn worker on the host.
+
+Buckets live in a small memory-mapped file (``settings.THROTTLE_STORE_PATH``,
+on /dev/shm by default) so the workers see one set of counters without a
+cache server. Each bucket is a fixed-size slot found by hashing its key;
+a check is one flock-guarded read-modify-write of that slot.
+
+Rates use DRF's "<n>/<period>" format under DEFAULT_THROTTLE_RATES with
+``<prefix>_<scope>`` keys, where scope is ``read``, ``write`` or ``export``
+(a view opts into ``export`` with ``throttle_scope = "export"``). A bucket
+holds ``n`` tokens and refills at ``n`` per period, so bursts up to ``n``
+pass and the sustained rate is capped.
+"""
+import contextlib
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+SLOT = struct.Struct("<Qdd")  # key hash, tokens, last refill (unix time)
+SLOTS = 1 << 16
+PROBES = 8
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """'100/min' -> (capacity, tokens per second); None disables the bucket."""
+    if rate is None:
+        return None
+    num, _, period = rate.partition("/")
+    if not num.isdigit() or int(num) < 1 or period[:1] not in PERIODS:
+        raise ValueError(f"Invalid throttle rate {rate!r}; expected e.g. '100/min'.")
+    num = int(num)
+    return num, num / PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    def __init__(self, path, slots=SLOTS):
+        self.slots = slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < slots * SLOT.size:
+            os.ftruncate(self.fd, slots * SLOT.size)
+        self.buf = mmap.mmap(self.fd, slots * SLOT.size)
+        self.thread_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def locked(self):
+        # flock serialises processes; the thread lock covers threaded workers
+        with self.thread_lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _slot(self, key_hash):
+        """Offset of the key's slot: its own, else a free one, else the stalest probed."""
+        start = key_hash % self.slots
+        stalest, stalest_at = None, float("inf")
+        for i in range(PROBES):
+            offset = ((start + i) % self.slots) * SLOT.size
+            stored, _, updated = SLOT.unpack_from(self.buf, offset)
+            if stored == key_hash or stored == 0:
+                return offset
+            if updated < stalest_at:
+                stalest, stalest_at = offset, updated
+        return stalest
+
+    def consume(self, key, capacity, refill, now=None):
+        """Take one token from ``key``'s bucket. Returns seconds to wait, 0.0 if allowed."""
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+        now = time.time() if now is None else now
+        with self.locked():
+            offset = self._slot(key_hash)
+            stored, tokens, updated = SLOT.unpack_from(self.buf, offset)
+            if stored != key_hash:
+                tokens, updated = capacity, now
+            tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill
+            SLOT.pack_into(self.buf, offset, key_hash, tokens, now)
+        return wait
+
+
+_stores = {}
+
+
+def get_store():
+    """This process's store, or None (logged once) if the file can't be opened."""
+    # opened lazily per process so each forked worker maps the file itself
+    path = settings.THROTTLE_STORE_PATH
+    key = (os.getpid(), path)
+    if key not in _stores:
+        try:
+            _stores[key] = TokenBucketStore(path)
+        except OSError:
+            # fail open: an unthrottled API beats one that 500s every request
+            logger.exception("Can't open throttle store %s; requests are not throttled", path)
+            _stores[key] = None
+    return _stores[key]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class: subclasses set ``prefix`` and implement ``get_ident_key``."""
+    prefix = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope:
+            return scope
+        return "read" if request.method in READ_METHODS else "write"
+
+    def get_ident_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        scope = self.get_scope(request, view)
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(f"{self.prefix}_{scope}"))
+        store = get_store()
+        if rate is None or store is None:
+            return True
+        wait = store.consume(f"{self.prefix}:{scope}:{ident}", *rate)
+        if wait:
+            self.wait_time = wait
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class ClientRateThrottle(TokenBucketThrottle):
+    """Per client: the authenticated user, else the client IP."""
+    prefix = "client"
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+
+class CondoRateThrottle(TokenBucketThrottle):
+    """Per condo, for the condo-scoped routes (/api/condos/{condo_pk}/...)."""
+    prefix = "condo"
+
+    def get_ident_key(self, request, view):
+        return getattr(view, "kwargs", {}).get("condo_pk")
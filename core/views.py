@@ -1,31 +1,157 @@
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from . import sharding
+from .db import pool_stats, retry_on_lock
 from .models import Condo, Unit, ParkingSpot, UnitParkingAssignment, ShortTermBooking
 from .serializers import (
     CondoSerializer, UnitSerializer, ParkingSpotSerializer,
     UnitParkingAssignmentSerializer, ShortTermBookingSerializer
 )
 
-class CondoViewSet(viewsets.ModelViewSet):
+class WriteRetryMixin:
+    """Retries the write step of create/update/destroy on transient DB locks."""
+
+    @retry_on_lock
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+
+    @retry_on_lock
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @retry_on_lock
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
+class ShardedViewSetMixin:
+    """
+    Routes condo-owned resources when sharding is on. Lists fan out over every
+    shard; detail and create requests find their shard and pin it for the rest
+    of the request. A no-op without CONDO_SHARDS.
+    """
+    shard_field = None  # payload field that locates the shard on create: "condo" or "unit"
+
+    def dispatch(self, request, *args, **kwargs):
+        with sharding.pin_shard():
+            return super().dispatch(request, *args, **kwargs)
+
+    def _unpinned(self):
+        return sharding.sharding_enabled() and sharding.current_shard() is None
+
+    def list(self, request, *args, **kwargs):
+        if not self._unpinned():
+            return super().list(request, *args, **kwargs)
+        queryset = sharding.FanOut(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def get_object(self):
+        if self._unpinned():
+            pk = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+            alias = sharding.find_shard(self.get_queryset().model, pk) if pk.isdigit() else None
+            if alias is None:
+                raise NotFound()
+            sharding.set_shard(alias)
+        return super().get_object()
+
+    def create(self, request, *args, **kwargs):
+        if self._unpinned():
+            if not isinstance(request.data, dict):
+                raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["Invalid data. Expected a dictionary."]})
+            pk = request.data.get(self.shard_field)
+            if self.shard_field == "condo":
+                alias = sharding.shard_for_condo(pk) if str(pk).isdigit() else None
+            else:
+                alias = sharding.find_shard(Unit, pk) if str(pk).isdigit() else None
+            if alias is None:
+                raise ValidationError({self.shard_field: [f'Invalid pk "{pk}" - object does not exist.']})
+            sharding.set_shard(alias)
+        return super().create(request, *args, **kwargs)
+
+class CondoScopedMixin:
+    """Serves a resource under /api/condos/{condo_pk}/..., pinned to that condo's shard."""
+    condo_field = "condo_id"  # queryset lookup tying a row to its condo
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        condo_pk = self.kwargs["condo_pk"]
+        if sharding.sharding_enabled():
+            alias = sharding.shard_for_condo(condo_pk)
+            if alias is None:
+                raise NotFound()
+            sharding.set_shard(alias)
+        get_object_or_404(Condo.objects.all(), pk=condo_pk)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{self.condo_field: self.kwargs["condo_pk"]})
+
+    def _check_condo(self, serializer):
+        data = serializer.validated_data
+        condo_id = data["condo"].pk if "condo" in data else data["unit"].condo_id if "unit" in data else None
+        if condo_id is not None and condo_id != int(self.kwargs["condo_pk"]):
+            raise ValidationError("Object belongs to a different condo.")
+
+    def perform_create(self, serializer):
+        self._check_condo(serializer)
+        super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        self._check_condo(serializer)
+        super().perform_update(serializer)
+
+class CondoViewSet(WriteRetryMixin, viewsets.ModelViewSet):
     queryset = Condo.objects.all()
     serializer_class = CondoSerializer
     permission_classes = [permissions.AllowAny]  # tighten later
 
-class UnitViewSet(viewsets.ModelViewSet):
+class UnitViewSet(ShardedViewSetMixin, WriteRetryMixin, viewsets.ModelViewSet):
     queryset = Unit.objects.select_related("condo").all()
     serializer_class = UnitSerializer
     permission_classes = [permissions.AllowAny]
+    shard_field = "condo"
 
-class ParkingSpotViewSet(viewsets.ModelViewSet):
+class ParkingSpotViewSet(ShardedViewSetMixin, WriteRetryMixin, viewsets.ModelViewSet):
     queryset = ParkingSpot.objects.select_related("condo").all()
     serializer_class = ParkingSpotSerializer
     permission_classes = [permissions.AllowAny]
+    shard_field = "condo"
 
-class UnitParkingAssignmentViewSet(viewsets.ModelViewSet):
+class UnitParkingAssignmentViewSet(ShardedViewSetMixin, WriteRetryMixin, viewsets.ModelViewSet):
     queryset = UnitParkingAssignment.objects.select_related("unit", "parking_spot").all()
     serializer_class = UnitParkingAssignmentSerializer
     permission_classes = [permissions.AllowAny]
+    shard_field = "unit"
 
-class ShortTermBookingViewSet(viewsets.ModelViewSet):
+class ShortTermBookingViewSet(ShardedViewSetMixin, WriteRetryMixin, viewsets.ModelViewSet):
     queryset = ShortTermBooking.objects.select_related("unit", "parking_spot").all()
     serializer_class = ShortTermBookingSerializer
     permission_classes = [permissions.AllowAny]
+    shard_field = "unit"
+
+# ---------- Condo-scoped (/api/condos/{condo_pk}/...) ----------
+
+class CondoUnitViewSet(CondoScopedMixin, UnitViewSet):
+    pass
+
+class CondoParkingSpotViewSet(CondoScopedMixin, ParkingSpotViewSet):
+    pass
+
+class CondoUnitParkingAssignmentViewSet(CondoScopedMixin, UnitParkingAssignmentViewSet):
+    condo_field = "unit__condo_id"
+
+class CondoShortTermBookingViewSet(CondoScopedMixin, ShortTermBookingViewSet):
+    condo_field = "unit__condo_id"
+
+# ---------- Ops ----------
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_stats(_request):
+    """Connection pool metrics (size, in use, waits) for the worker serving the request."""
+    return Response(pool_stats())
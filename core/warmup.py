@@ -0,0 +1,104 @@
+"""
+Start-up warm-up so a fresh worker's first requests don't pay for lazy setup.
+
+``warm_up()`` is safe to run in a preloading gunicorn master: it only builds
+process-independent state (URL resolver, DRF settings, model metadata)
+and leaves no connections open. ``start_worker()`` opens the per-process
+resources in the process that serves traffic, after any fork, and only then
+marks it ready for /api/healthz. Only DB aliases that outlive a request
+(pooled, or CONN_MAX_AGE != 0) are warmed; with the default SQLite profile
+Django would close the connection again at the first request.
+"""
+import logging
+import threading
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def mark_ready():
+    _ready.set()
+
+
+def _timed(timings, name, func):
+    started = time.perf_counter()
+    func()
+    timings[name] = time.perf_counter() - started
+
+
+def _warm_urls():
+    resolver = get_resolver()
+    resolver.url_patterns  # imports the URLconf, views and serializers
+    resolver.reverse_dict  # populates the reverse lookup tables
+
+
+def _warm_drf():
+    from rest_framework.settings import api_settings
+
+    for name in (
+        "DEFAULT_RENDERER_CLASSES", "DEFAULT_PARSER_CLASSES",
+        "DEFAULT_AUTHENTICATION_CLASSES", "DEFAULT_PERMISSION_CLASSES",
+        "DEFAULT_THROTTLE_CLASSES", "DEFAULT_PAGINATION_CLASS",
+        "DEFAULT_CONTENT_NEGOTIATION_CLASS",
+    ):
+        getattr(api_settings, name)
+
+
+def _warm_serializers():
+    """
+    Build each serializer's fields once. DRF rebuilds fields per serializer
+    instance, so nothing of its own is kept; what persists are the imports and
+    the Django caches the build reads (model ``_meta`` field maps, each model
+    field's validators).
+    """
+    from condo_backend.urls import router
+
+    for _prefix, viewset, _basename in router.registry:
+        viewset.serializer_class().fields
+
+
+def warm_up():
+    """Build the URL resolver and DRF settings and fill the caches serializers read."""
+    timings = {}
+    _timed(timings, "urls", _warm_urls)
+    _timed(timings, "drf", _warm_drf)
+    _timed(timings, "serializers", _warm_serializers)
+    connections.close_all()  # nothing may leak into forked workers
+    return timings
+
+
+def warm_worker():
+    """Open this process's pooled or persistent DB connections and throttle store."""
+    from .throttling import get_store
+
+    timings = {}
+    for alias in connections:
+        conn = connections[alias]
+        if conn.settings_dict["CONN_MAX_AGE"] == 0 and not conn.settings_dict["OPTIONS"].get("pool"):
+            continue  # closed again by close_old_connections at request_started
+        _timed(timings, f"db:{alias}", conn.ensure_connection)
+        if getattr(conn, "pool", None):
+            conn.close()  # hand it back; the opened pool keeps it warm
+    _timed(timings, "throttle_store", get_store)
+    return timings
+
+
+def start_worker(log=logger):
+    """
+    Warm this worker, then mark it ready. A failed warm-up is logged, not
+    raised: the worker still serves, opening connections on first use.
+    """
+    try:
+        warm_worker()
+    except Exception:
+        log.exception("Worker warm-up failed; serving cold")
+    mark_ready()
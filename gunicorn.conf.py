@@ -0,0 +1,19 @@
+"""
+Gunicorn config. The app is preloaded, so imports and warm-up happen once in
+the master before forking; each worker then opens its own DB connections in
+post_worker_init and only then reports ready on /api/healthz.
+"""
+import os
+
+wsgi_app = "condo_backend.wsgi:create_app(worker_hook=True)"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+
+def post_worker_init(worker):
+    # start_worker logs warm-up failures: an exception here would be a
+    # WORKER_BOOT_ERROR, which halts the whole arbiter
+    from core.warmup import start_worker
+    start_worker(worker.log)